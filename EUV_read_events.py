@@ -10,9 +10,17 @@
 使用前请修改下面的 GAME_ROOT / COUNTRY_TAG / COUNTRY_NAME / RULER_NAME。
 """
 
+# 类型注解只作说明、不在运行时求值，str | None 这类写法在 3.10 以下也能直接运行
+from __future__ import annotations
+
 import os
 import re
-import glob
+import mmap
+import contextlib
+import functools
+import hashlib
+import pickle
+from concurrent.futures import ProcessPoolExecutor
 
 # ======= 需要你自己修改的配置 =======
 
@@ -34,8 +42,31 @@ EVENT_PREFIX = f"flavor_{TAG_LOWER}"  # 如 flavor_fra
 RULER_SCOPE_1 = f"ruler_{TAG_LOWER}"    # 如 ruler_fra
 RULER_SCOPE_2 = f"{TAG_LOWER}_ruler"    # 如 fra_ruler
 
+# render_text 里“纯代码宏”的直接替换（国家名 / 君主名等）
+STATIC_MACROS = {
+    "ROOT.GetCountry.GetName": COUNTRY_NAME,
+    "ROOT.GetCountry.GetNameWithNoTooltip": COUNTRY_NAME,
+    f"{RULER_SCOPE_1}.GetName": RULER_NAME,
+    f"{RULER_SCOPE_1}.GetShortNameWithNoTooltip": RULER_NAME,
+    f"{RULER_SCOPE_2}.GetName": RULER_NAME,
+    f"{RULER_SCOPE_2}.GetShortNameWithNoTooltip": RULER_NAME,
+    # 你还可以按需加别的，比如 ruler_nap 等
+}
+
+# 事件头：flavor_fra.1 =（事件文件按 bytes 扫描）
+EVENT_ID_RE = re.compile(rb"(%s\.(\d+))\s*=" % re.escape(EVENT_PREFIX.encode("utf-8")))
+
+# 事件数不少于这个值时才用多进程生成输出（进程启动本身也有开销）
+PARALLEL_MIN_EVENTS = 32
+
+# 本地化解析结果的缓存目录（按 yml 文件的路径/mtime/大小做 key）
+LOC_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "euv_read_events")
+# 修改 load_localization 的解析逻辑后请递增，使旧缓存失效
+LOC_CACHE_VERSION = 3
+
 # 匹配类似 estate_type:burghers_estate / c:NAP / policy:permanent_tax 这样的结构
-COLON_KEY_RE = re.compile(r"\b([A-Za-z_][A-Za-z0-9_]*)\s*:\s*([A-Za-z0-9_]+)")
+# （冒号两侧的空白不跨行，整段多行文本一起替换时不会把相邻两行连起来）
+COLON_KEY_RE = re.compile(r"\b([A-Za-z_][A-Za-z0-9_]*)[^\S\n]*:[^\S\n]*([A-Za-z0-9_]+)")
 
 # ① 主语映射：你想怎么翻就怎么写，之后只改这里就行
 SUBJECT_MAP = {
@@ -68,11 +99,17 @@ SIGN_MAP = {
     "plus":"增加",
 }
 
-# ④ 匹配 subject_level_sign 这种结构
+# ④ subject_level_sign 这种结构
 #    比如 stability_mild_penalty、cultural_influence_extreme_bonus
-SUBJECT_LEVEL_SIGN_RE = re.compile(
-    r"^([a-zA-Z_]+)_(weak|mild|severe|extreme|ultimate)_(bonus|penalty|plus)$"
-)
+#    在 CODE_TOKEN_RE（CODE_TOKEN_MAP 之后）里和普通关键字一起匹配
+
+# 逻辑块的“块头行”：OR = { / AND = { / NOT = {
+LOGIC_HEAD_RE = re.compile(r"(OR|AND|NOT)\s*=\s*\{")
+LOGIC_HEAD_TEXT = {
+    "OR": "满足以下任一条件：",      # 或 -> 满足以下任一条件
+    "AND": "同时满足以下全部条件：",  # 且 -> 同时满足以下全部条件
+    "NOT": "不满足以下条件：",        # 非 -> 不满足以下条件
+}
 
 def beautify_logic_line(content: str, text: str) -> str:
     """
@@ -98,21 +135,16 @@ def beautify_logic_line(content: str, text: str) -> str:
         return text
 
     # 只处理“块头行”：OR = { / AND = { / NOT = {
-    if re.match(r"OR\s*=\s*\{", s_content):
-        # 或 -> 满足以下任一条件
-        return "满足以下任一条件："
-
-    if re.match(r"AND\s*=\s*\{", s_content):
-        # 且 -> 同时满足以下全部条件
-        return "同时满足以下全部条件："
-
-    if re.match(r"NOT\s*=\s*\{", s_content):
-        # 非 -> 不满足以下条件
-        return "不满足以下条件："
+    m = LOGIC_HEAD_RE.match(s_content)
+    if m:
+        return LOGIC_HEAD_TEXT[m.group(1)]
 
     # 其他行不处理
     return text
 
+# 匹配例如 "ruler ?= {"、"ruler_or_regent ?= {"、"character:xxx ?= {"
+SCOPE_HEAD_RE = re.compile(r".*\?\s*=\s*\{")
+
 def cleanup_empty_scopes(lines):
     """
     lines: 列表，每个元素是 dict:
@@ -124,42 +156,50 @@ def cleanup_empty_scopes(lines):
 
     功能：
       找出形如 xxx ?= { ... } 这种块，如果块内所有行 text 都是空，就把整块删掉。
-    """
-    to_delete = set()
-    n = len(lines)
-    i = 0
-
-    while i < n:
-        c = lines[i]["content"].strip()
-        # 匹配例如 "ruler ?= {"、"ruler_or_regent ?= {"、"character:xxx ?= {"
-        if re.match(r".*\?\s*=\s*\{", c):
-            # 向后找到与之配对的第一个单独的 "}"
-            j = i + 1
-            while j < n and lines[j]["content"].strip() != "}":
-                j += 1
-
-            if j < n and lines[j]["content"].strip() == "}":
-                # 检查 i+1 .. j-1 之间是否有“需要显示”的行
-                has_visible = False
-                for k in range(i + 1, j):
-                    if lines[k]["text"] and lines[k]["text"].strip():
-                        has_visible = True
-                        break
+      嵌套的空作用域删掉后，外层作用域如果也没有可见内容，一并删掉。
 
-                # 如果没有任何可见内容，这个作用域就可以整个删掉
-                if not has_visible:
-                    for k in range(i, j + 1):
-                        to_delete.add(k)
-                    i = j + 1
-                    continue   # 继续从下一个位置扫
+    从上到下只扫一遍，用栈记录当前打开的块。
+    """
+    drops = []   # 要删除的区间 (start, end)，end 不含
+    stack = []   # 每个元素：[块头行下标, 是否 ?= 作用域, 块头行是否可见, 块内是否有可见行]
+
+    for k, info in enumerate(lines):
+        c = info["content"]   # CODE_LINE_RE 给出的 content 已去掉首尾空白
+        visible = bool(info["text"] and info["text"].strip())
+        net = c.count("{") - c.count("}")
+
+        if net > 0:
+            # 块头行：自己的可见性要等块结束、确定不删时才算到外层
+            stack.append([k, bool(SCOPE_HEAD_RE.match(c)), visible, False])
+            for _ in range(net - 1):
+                stack.append([k, False, False, False])
+            continue
 
-        i += 1
+        if visible and stack:
+            stack[-1][3] = True
 
-    # 实际删除：重建列表
-    if to_delete:
-        new_lines = [info for idx, info in enumerate(lines) if idx not in to_delete]
+        for _ in range(-net):
+            if not stack:
+                break
+            start, is_scope, head_visible, has_visible = stack.pop()
+            if is_scope and not has_visible:
+                # 如果没有任何可见内容，这个作用域就可以整个删掉
+                drops.append((start, k + 1))
+            elif stack and (head_visible or has_visible):
+                stack[-1][3] = True
+
+    # 实际删除：按区间拼接保留的部分（内层区间会被外层覆盖）
+    if drops:
+        drops.sort()
+        new_lines = []
+        pos = 0
+        for start, end in drops:
+            if start > pos:
+                new_lines.extend(lines[pos:start])
+            pos = max(pos, end)
+        new_lines.extend(lines[pos:])
         lines[:] = new_lines
-        
+
 def replace_colon_keys(text: str, loc: dict) -> str:
     """
     将 text 中所有 prefix:key 形式的片段，用 key 在 loc 中查找并替换。
@@ -178,18 +218,15 @@ def replace_colon_keys(text: str, loc: dict) -> str:
 
     return COLON_KEY_RE.sub(repl, text)
 
-TOKEN_RE = re.compile(r"\b[A-Za-z_][A-Za-z0-9_]*\b")
-
 def translate_code_tokens(line: str) -> str:
+    # CODE_TOKEN_RE 只会命中 subject_level_sign 组合 token 或 CODE_TOKEN_MAP 里的关键字，
+    # 其他标识符不会进回调
     def repl(m: re.Match) -> str:
-        token = m.group(0)
-
         # 1️⃣ 先处理 subject_level_sign 这种组合 token
-        m_sls = SUBJECT_LEVEL_SIGN_RE.match(token)
-        if m_sls:
-            subject_en = m_sls.group(1)   # stability / cultural_influence / ...
-            level_en   = m_sls.group(2)   # weak / mild / severe / extreme / ultimate
-            sign_en    = m_sls.group(3)   # bonus / penalty
+        if m.lastgroup != "token":
+            subject_en = m.group("subject")   # stability / cultural_influence / ...
+            level_en   = m.group("level")     # weak / mild / severe / extreme / ultimate
+            sign_en    = m.group("sign")      # bonus / penalty
 
             subject_zh = SUBJECT_MAP.get(subject_en, subject_en)
             level_zh   = LEVEL_MAP.get(level_en, level_en)
@@ -200,12 +237,40 @@ def translate_code_tokens(line: str) -> str:
             return f"{subject_zh}{level_zh}{sign_zh}"
 
         # 2️⃣ 再用普通关键字映射（has_ruler / in_union_with / OR / NOT 等）
-        return CODE_TOKEN_MAP.get(token, token)
+        return CODE_TOKEN_MAP[m.group(0)]
 
-    return TOKEN_RE.sub(repl, line)
+    return CODE_TOKEN_RE.sub(repl, line)
 
 # ======= 本地化读取相关 =======
 
+def map_file(f):
+    """
+    把已打开的二进制文件只读 mmap 进来，用在 with 里。
+    空文件不能 mmap，这时得到 b""。
+    """
+    if os.fstat(f.fileno()).st_size == 0:
+        return contextlib.nullcontext(b"")
+    return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+# 一次性扫描整个 yml 的 key/value 正则（bytes）：
+#   group(1) key；值落在 group(2)/(3)/(4) 中的某一个，即 m.lastindex 指向的那组
+# 与逐行解析的规则保持一致：
+#   - 跳过空行、# 注释行，以及 l_simp_chinese: 这类语言头（l_ 开头，不分大小写）
+#   - key:0 "xxx" 这种会去掉数字版本号；只有数字没有值的行跳过
+#   - 有开头引号时去掉首尾引号：group(2) 有结尾引号，group(3) 没有；
+#     没有开头引号时 group(4) 原样保留
+#   - 文件开头的 UTF-8 BOM 直接在正则里跳过，不用切片复制整个文件；
+#     先行断言里也排除 BOM，免得首行是注释/语言头时回溯把 BOM 吞进 key
+# 首尾引号由分组直接排除；除结尾引号缺失的少数行外都是贪婪匹配，
+# 不用像 (.*?) 那样逐个字符试探行尾
+LOC_KV_RE = re.compile(
+    rb'(?m)^(?:\A\xef\xbb\xbf)?[ \t]*(?![ \t#]|[lL]_|\A\xef\xbb\xbf)([^:\r\n]*?)[ \t]*:[ \t]*'
+    rb'(?:\d\S*[ \t]+(?=[^ \t\r\n])|(?=[^\d \t\r\n]))'
+    rb'(?:"(?:(.*)"|(.*?))|(.*\S))[ \t\r]*$'
+)
+
+
 def load_localization(path):
     """
     读取单个 yml 本地化文件，返回 dict: key -> 文本
@@ -217,49 +282,12 @@ def load_localization(path):
     """
     data = {}
     try:
-        with open(path, "r", encoding="utf-8-sig") as f:
-            for line in f:
-                line = line.rstrip("\r\n")
-                if not line.strip():
-                    continue
-                if line.lstrip().startswith("#"):
-                    continue
-                if ":" not in line:
-                    continue
-
-                key_part, value_part = line.split(":", 1)
-                key = key_part.strip()
-                value_part = value_part.strip()
-
-                # 语言头
-                if key.lower().startswith("l_"):
-                    continue
-
-                if not value_part:
-                    continue
-
-                # 处理 key:0 "xxx"
-                if value_part[0].isdigit():
-                    parts = value_part.split(None, 1)
-                    if len(parts) == 2:
-                        value_part = parts[1]
-                    else:
-                        continue
-
-                # 去掉首尾引号
-                if value_part.startswith('"') and value_part.endswith('"'):
-                    value = value_part[1:-1]
-                else:
-                    # 尽量保守处理
-                    if value_part.startswith('"'):
-                        value = value_part[1:]
-                    else:
-                        value = value_part
-
-                # 将 "" 还原为 "
-                value = value.replace('""', '"')
-
-                data[key] = value
+        # 整个文件 mmap 后一次正则扫描，再批量解码；将 "" 还原为 "
+        with open(path, "rb") as f, map_file(f) as buf:
+            data = {
+                m[1].decode("utf-8"): m[m.lastindex].decode("utf-8").replace('""', '"')
+                for m in LOC_KV_RE.finditer(buf)
+            }
     except FileNotFoundError:
         print(f"[警告] 找不到本地化文件: {path}")
     except Exception as e:
@@ -268,73 +296,224 @@ def load_localization(path):
     return data
 
 
+def _scan_ymls(d):
+    """
+    用 os.scandir 列出目录 d 下所有 *_l_simp_chinese.yml，返回 DirEntry 列表。
+    """
+    try:
+        with os.scandir(d) as it:
+            return [e for e in it if e.name.endswith("_l_simp_chinese.yml") and e.is_file()]
+    except OSError:
+        return []
+
+
+def _loc_cache_path(entries):
+    """
+    根据所有 yml 的 (路径, mtime, 大小) 计算缓存文件路径。
+    任何一个文件被修改/增删，都会得到新的缓存文件。
+    """
+    sig = tuple((e.path, st.st_mtime_ns, st.st_size) for e in entries for st in (e.stat(),))
+    digest = hashlib.blake2b(repr((LOC_CACHE_VERSION, sig)).encode("utf-8")).hexdigest()
+    return os.path.join(LOC_CACHE_DIR, f"loc_{digest}.pkl")
+
+
+def _save_loc_cache(loc, cache_path):
+    """
+    写入本地化缓存：先写临时文件再 os.replace 到正式文件名，
+    写到一半出错或被中断都不会留下残缺的缓存。
+    写入成功后删掉其他 loc_*.pkl —— yml 每变一次（比如游戏更新）缓存就换一个文件名，
+    旧的不会再用到。
+    """
+    tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+    try:
+        os.makedirs(LOC_CACHE_DIR, exist_ok=True)
+        with open(tmp_path, "wb") as f:
+            pickle.dump(loc, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, cache_path)
+    except Exception as e:
+        print(f"[警告] 写入本地化缓存失败: {cache_path} ({e})")
+        return
+    finally:
+        with contextlib.suppress(OSError):
+            os.remove(tmp_path)
+
+    keep = os.path.basename(cache_path)
+    with contextlib.suppress(OSError), os.scandir(LOC_CACHE_DIR) as it:
+        for e in it:
+            if e.name.startswith("loc_") and e.name.endswith(".pkl") and e.name != keep:
+                with contextlib.suppress(OSError):
+                    os.remove(e.path)
+
+
 def load_all_localizations(game_root):
     """
     从 simp_chinese 及 simp_chinese/events/DHE 下加载所有 *_l_simp_chinese.yml。
+
+    解析结果会缓存到 LOC_CACHE_DIR，yml 没有变化时直接读缓存。
     """
     loc = {}
     simp_dir = os.path.join(game_root, "game", "main_menu", "localization", "simp_chinese")
-    paths = []
-
-    if os.path.isdir(simp_dir):
-        paths.extend(glob.glob(os.path.join(simp_dir, "*_l_simp_chinese.yml")))
-        dhe_dir = os.path.join(simp_dir, "events", "DHE")
-        location_names_dir = os.path.join(simp_dir, "location_names")
-        if os.path.isdir(dhe_dir):
-            paths.extend(glob.glob(os.path.join(dhe_dir, "*_l_simp_chinese.yml")))
-        if os.path.isdir(location_names_dir):
-            paths.extend(glob.glob(os.path.join(location_names_dir, "*_l_simp_chinese.yml")))
-
-    # 去重
-    uniq_paths = []
-    seen = set()
-    for p in paths:
-        if p not in seen:
-            uniq_paths.append(p)
-            seen.add(p)
-
-    if not uniq_paths:
+
+    # 三个目录互不重叠、scandir 又不递归，得到的路径天然不重复；
+    # 目录不存在时 _scan_ymls 返回空列表，不用先 isdir 再 stat 一遍
+    uniq_entries = [
+        *_scan_ymls(simp_dir),
+        *_scan_ymls(os.path.join(simp_dir, "events", "DHE")),
+        *_scan_ymls(os.path.join(simp_dir, "location_names")),
+    ]
+
+    if not uniq_entries:
         print("[警告] 没有找到任何本地化 yml 文件。")
         return {}
 
-    for p in uniq_paths:
-        part = load_localization(p)
-        loc.update(part)
-
-    print(f"[信息] 已加载 {len(uniq_paths)} 个本地化文件，共 {len(loc)} 条键值。")
+    cache_path = _loc_cache_path(uniq_entries)
+    if os.path.isfile(cache_path):
+        try:
+            with open(cache_path, "rb") as f:
+                loc = pickle.load(f)
+            print(f"[信息] 已从缓存加载 {len(uniq_entries)} 个本地化文件，共 {len(loc)} 条键值。")
+            return loc
+        except Exception as e:
+            print(f"[警告] 读取本地化缓存出错，将重新解析: {cache_path} ({e})")
+            loc = {}
+
+    # 各文件互不相关，分到多个进程解析（正则匹配不释放 GIL，线程池只能重叠 I/O）；
+    # map 保持原顺序，后加载的同名 key 照旧覆盖前面的
+    with ProcessPoolExecutor() as ex:
+        for part in ex.map(load_localization, [e.path for e in uniq_entries], chunksize=4):
+            loc.update(part)
+
+    _save_loc_cache(loc, cache_path)
+
+    print(f"[信息] 已加载 {len(uniq_entries)} 个本地化文件，共 {len(loc)} 条键值。")
     return loc
 
 
+# filter_localization 用来收集可能被查询的 key：
+#   `xxx = value` 右侧（title/desc/name/custom_tooltip/key/modifier/type 等）
+ASSIGNED_VALUE_RE = re.compile(r"(?==\s*([^\s#]+))")
+#   prefix:key 里的 key（replace_colon_keys 只查 [A-Za-z0-9_]+）
+LOC_WORD_RE = re.compile(r"[A-Za-z0-9_]+")
+
+
+def filter_localization(loc, events):
+    """
+    只保留这些事件可能查到的本地化键值，返回新的 dict。
+
+    事件块里出现的赋值右侧、单词、[...] 中的 'key' 都算；
+    被用到的文本里引用的 'key' 和单词（插入脚本行后还会做 prefix:key 替换）继续往下找，直到不再增加。
+    结果只影响 loc 的大小（多进程时要传给每个子进程），不影响输出。
+    """
+    needed = set()
+    for ev in events:
+        block = ev["block"]
+        needed.update(ASSIGNED_VALUE_RE.findall(block))
+        needed.update(LOC_WORD_RE.findall(block))
+        needed.update(INNER_KEY_RE.findall(block))
+
+    result = {}
+    pending = [k for k in needed if k in loc]
+    while pending:
+        key = pending.pop()
+        if key in result:
+            continue
+        val = loc[key]
+        result[key] = val
+        for ref in INNER_KEY_RE.findall(val) + LOC_WORD_RE.findall(val):
+            if ref in loc and ref not in result:
+                pending.append(ref)
+
+    return result
+
+
 # ======= 事件脚本解析相关 =======
 
-def find_matching_brace(text, start_pos):
+def find_matching_brace(text: str, start_pos: int) -> int:
     """
     从 start_pos（一个 '{' 的位置）开始找与之匹配的 '}'。
+    （整个事件文件按 bytes 扫描时用的是 build_brace_map，这里只处理 str。）
+
+    用 find 直接跳到下一个 '{' / '}'，只在括号处更新 depth，
+    不再逐字符循环。
     """
+    # next_open / next_close 只在被越过之后才重新 find，每个括号只找一次
     depth = 0
-    for i in range(start_pos, len(text)):
-        ch = text[i]
-        if ch == "{":
+    next_open = text.find("{", start_pos)
+    next_close = text.find("}", start_pos)
+    while next_close != -1:
+        if next_open != -1 and next_open < next_close:
             depth += 1
-        elif ch == "}":
+            next_open = text.find("{", next_open + 1)
+        else:
             depth -= 1
             if depth == 0:
-                return i
+                return next_close
+            next_close = text.find("}", next_close + 1)
     return -1
 
 
-def extract_block(text, keyword):
-    pattern = re.compile(r"%s\s*=\s*\{" % re.escape(keyword))
-    m = pattern.search(text)
-    if not m:
-        return None
+# build_brace_map 关心的片段：# 注释、"..." 字符串（都不跨行），以及 { / }
+BRACE_TOKEN_RE = re.compile(r'#[^\n]*|"[^"\n]*"?|(\{)|(\})')
+BRACE_TOKEN_BYTES_RE = re.compile(rb'#[^\n]*|"[^"\n]*"?|(\{)|(\})')
+
+
+def build_brace_map(text: str | bytes) -> dict[int, int]:
+    """
+    一遍扫描 text（str 或 bytes），返回 {'{' 的下标: 与之匹配的 '}' 的下标}。
+    注释和字符串里的括号不计入；没有配对的括号不会出现在结果里。
+
+    之后找任意一个块的结尾都只是一次 dict 查找，不用再从 '{' 往后数括号。
+    """
+    token_re = BRACE_TOKEN_RE if isinstance(text, str) else BRACE_TOKEN_BYTES_RE
+    brace_map: dict[int, int] = {}
+    stack: list[int] = []
+    for m in token_re.finditer(text):
+        kind = m.lastindex
+        if kind == 1:
+            stack.append(m.start())
+        elif kind == 2 and stack:
+            brace_map[stack.pop()] = m.start()
+    return brace_map
+
+
+def _block_end(text: str, brace_start: int, brace_map: dict[int, int] | None) -> int:
+    """brace_start 处 '{' 的配对位置；有 brace_map 就直接查表。"""
+    if brace_map is None:
+        return find_matching_brace(text, brace_start)
+    return brace_map.get(brace_start, -1)
+
+
+@functools.lru_cache(maxsize=256)
+def _block_re(keyword: str) -> re.Pattern:
+    """`keyword = {` 的正则，每个 keyword 只编译一次。"""
+    return re.compile(r"%s\s*=\s*\{" % re.escape(keyword))
+
+
+@functools.lru_cache(maxsize=256)
+def _assignment_re(field: str) -> re.Pattern:
+    """`field = xxx` 的正则，每个 field 只编译一次。"""
+    return re.compile(r"\b%s\s*=\s*([^\s#]+)" % re.escape(field))
 
-    brace_start = text.find("{", m.end() - 1)
-    if brace_start == -1:
-        return None
-    brace_end = find_matching_brace(text, brace_start)
-    if brace_end == -1:
-        return None
+
+def extract_block(text: str, keyword: str, brace_map: dict[int, int] | None = None) -> str | None:
+    """
+    提取第一个 `keyword = { ... }` 的内容。
+    brace_map 为 build_brace_map(text) 的结果；传入时会跳过注释里的同名块。
+    """
+    pattern = _block_re(keyword)
+    pos = 0
+    while True:
+        m = pattern.search(text, pos)
+        if not m:
+            return None
+
+        brace_start = m.end() - 1
+        brace_end = _block_end(text, brace_start, brace_map)
+        if brace_end != -1:
+            break
+        if brace_map is None:
+            return None
+        pos = m.end()
 
     inner = text[brace_start + 1:brace_end]
     # 原来是：return inner.strip()
@@ -344,9 +523,15 @@ def extract_block(text, keyword):
     # return inner
 
 
-def extract_option_blocks(text):
+OPTION_RE = re.compile(r"option\s*=\s*\{")
+# 选项里的 name = flavor_fra.1.a / custom_tooltip = enables_xxx，一次 match 区分
+OPTION_LINE_RE = re.compile(r"(name|custom_tooltip)\s*=\s*([^\s#]+)")
+
+
+def extract_option_blocks(text: str, brace_map: dict[int, int] | None = None) -> list[dict]:
     """
     从事件主体 text 中提取所有 option = { ... } 块。
+    brace_map 为 build_brace_map(text) 的结果，可选。
     返回列表，每个元素包含：
     {
         "name": 选项 key (如 flavor_fra.1.a)，可能为 None，
@@ -355,19 +540,20 @@ def extract_option_blocks(text):
     }
     """
     res = []
-    pattern = re.compile(r"option\s*=\s*\{")
     pos = 0
     while True:
-        m = pattern.search(text, pos)
+        m = OPTION_RE.search(text, pos)
         if not m:
             break
 
-        brace_start = text.find("{", m.end() - 1)
-        if brace_start == -1:
-            break
-        brace_end = find_matching_brace(text, brace_start)
+        brace_start = m.end() - 1
+        brace_end = _block_end(text, brace_start, brace_map)
         if brace_end == -1:
-            break
+            if brace_map is None:
+                break
+            # 注释里的 option = {，跳过
+            pos = m.end()
+            continue
 
         block_text = text[brace_start + 1:brace_end].strip()
         pos = brace_end + 1
@@ -377,8 +563,7 @@ def extract_option_blocks(text):
         tooltips = []
 
         for raw_line in block_text.splitlines():
-            line = raw_line.rstrip()
-            stripped = line.strip()
+            stripped = raw_line.strip()
 
             if not stripped:
                 continue
@@ -387,16 +572,14 @@ def extract_option_blocks(text):
                 lines_keep.append(raw_line)
                 continue
 
-            # name = flavor_fra.1.a
-            m_name = re.match(r"name\s*=\s*([^\s#]+)", stripped)
-            if m_name:
-                name_key = m_name.group(1)
-                continue
-
-            # custom_tooltip = enables_xxx
-            m_tip = re.match(r"custom_tooltip\s*=\s*([^\s#]+)", stripped)
-            if m_tip:
-                tooltips.append(m_tip.group(1))
+            m_opt = OPTION_LINE_RE.match(stripped)
+            if m_opt:
+                if m_opt.group(1) == "name":
+                    # name = flavor_fra.1.a
+                    name_key = m_opt.group(2)
+                else:
+                    # custom_tooltip = enables_xxx
+                    tooltips.append(m_opt.group(2))
                 continue
 
             lines_keep.append(raw_line)
@@ -406,45 +589,54 @@ def extract_option_blocks(text):
     return res
 
 
-def get_assignment_key(block, field):
+def get_assignment_key(block: str, field: str) -> str | None:
     """
     在 block 中寻找 `field = xxx`，返回右侧的 xxx。
     """
-    m = re.search(r"\b%s\s*=\s*([^\s#]+)" % re.escape(field), block)
+    m = _assignment_re(field).search(block)
     if m:
         return m.group(1)
     return None
 
 
-def parse_events(code_text):
+def scan_events(code):
     """
-    从整个代码文本中提取所有 EVENT_PREFIX.X 事件。
-    返回列表：[{"id": "flavor_fra.1", "num": 1, "block": "..."}]
+    一遍扫描整个代码（bytes），找出所有 EVENT_PREFIX.X = { ... } 的位置。
+    返回列表：[(event_id, num, brace_start, brace_end)]，只记录下标，不切片。
     """
-    events = []
-    pattern = re.compile(r"(%s\.\d+)\s*=" % re.escape(EVENT_PREFIX))
-
-    for m in pattern.finditer(code_text):
-        event_id = m.group(1)
-        brace_start = code_text.find("{", m.end())
+    spans = []
+    brace_map = build_brace_map(code)
+    for m in EVENT_ID_RE.finditer(code):
+        brace_start = code.find(b"{", m.end())
         if brace_start == -1:
             continue
-        brace_end = find_matching_brace(code_text, brace_start)
+        brace_end = brace_map.get(brace_start, -1)
         if brace_end == -1:
             continue
+        spans.append((m.group(1).decode("utf-8"), int(m.group(2)), brace_start, brace_end))
 
-        block = code_text[brace_start + 1:brace_end]
+    return spans
 
-        try:
-            num = int(event_id.split(".")[1])
-        except Exception:
-            num = 0
 
-        events.append({"id": event_id, "num": num, "block": block})
+def parse_events(code):
+    """
+    从整个代码（bytes）中提取所有 EVENT_PREFIX.X 事件。
+    只有切出来的事件块才解码成 str。
+    返回列表：[{"id": "flavor_fra.1", "num": 1, "block": "..."}]
+    """
+    spans = scan_events(code)
+    # 事件在文件里基本是按编号顺序写的，只有出现乱序时才排序（稳定排序，同号保持文件顺序）
+    if any(a[1] > b[1] for a, b in zip(spans, spans[1:])):
+        spans.sort(key=lambda span: span[1])
+
+    return [
+        {"id": event_id, "num": num, "block": code[brace_start + 1:brace_end].decode("utf-8")}
+        for event_id, num, brace_start, brace_end in spans
+    ]
 
-    events.sort(key=lambda e: e["num"])
-    return events
 
+# str.splitlines 认作换行的字符
+LINE_BREAK_RE = re.compile(r"[\n\r\x0b\x0c\x1c-\x1e\x85\u2028\u2029]")
 
 def indent_lines(text, indent="\t"):
     """
@@ -452,61 +644,59 @@ def indent_lines(text, indent="\t"):
     """
     if not text:
         return ""
-    lines = []
-    for line in text.splitlines():
-        if line.strip():
-            lines.append(indent + line.strip())
-        else:
-            lines.append("")
-    return "\n".join(lines)
+    # 本地化文本基本都是单行（\n 是字面量），不用拆行
+    if not LINE_BREAK_RE.search(text):
+        line = text.strip()
+        return indent + line if line else ""
+    # 多行：每行 strip 一次，空行保留为空
+    return "\n".join(indent + line if line else "" for line in map(str.strip, text.splitlines()))
 
 
 # ======= 文本和效果的人类可读化 =======
+
+# render_text 一次扫描处理的三种片段：#italic / #! 标记，和 [ ... ] 占位符
+RENDER_RE = re.compile(r"(?P<italic>#italic\s*)|(?P<stop>#!)|\[(?P<bracket>[^\]]+)\]")
+# [GetPolicy('permanent_tax').GetName] 里的 'key'
+INNER_KEY_RE = re.compile(r"'([^']+)'")
+# [target_character.xxx] -> [target_character]
+TARGET_CHARACTER_RE = re.compile(r"\[(target_character)\.[^\]]+\]")
+
 def render_text(text, loc):
-    if not text:
+    # 没有 [ ] 占位符也没有 # 标记的文本（大多数脚本行和不少本地化文本）原样返回，
+    # 不进正则
+    if not text or ("[" not in text and "#" not in text):
         return text
 
-    # 0) 清理 #italic / #!
-    text = re.sub(r"#italic\s*", "", text)
-    text = text.replace("#!", "")
-
-    # 1) 定义一些“纯代码宏”的直接替换（国家名 / 君主名等）
-    static_macros = {
-        "ROOT.GetCountry.GetName": COUNTRY_NAME,
-        "ROOT.GetCountry.GetNameWithNoTooltip": COUNTRY_NAME,
-        "ruler_fra.GetName": RULER_NAME,
-        "ruler_fra.GetShortNameWithNoTooltip": RULER_NAME,
-        # 你还可以按需加别的，比如 ruler_nap 等
-    }
+    # 回调里用到的表和方法绑定成局部变量，省掉每次的全局/属性查找
+    def repl(m: re.Match, static_macros=STATIC_MACROS, loc_get=loc.get, key_re=INNER_KEY_RE) -> str:
+        inner = m.group("bracket")
 
-    def repl_bracket(m: re.Match) -> str:
-        inner = m.group(1)
+        # 0) 清理 #italic / #!
+        if inner is None:
+            return ""
+        if "#" in inner:
+            inner = RENDER_RE.sub("", inner)
 
         # 1) 完全匹配静态宏
-        if inner in static_macros:
-            return (f"「{static_macros[inner]}」")
-
-        # 2) 如果里面有 'key'，就把 key 当作本地化键
-        m_key = re.search(r"'([^']+)'", inner)
-        if m_key:
-            key = m_key.group(1)
-            val = loc.get(key)
-            if val:
-                return (f"「{val}」")
-
-        # 3) 否则原样保留
-        return m.group(0)
-
-    # 把所有 [ ... ] 都走一遍
-    text = re.sub(r"\[([^\]]+)\]", repl_bracket, text)
-
-    text = re.sub(
-        r"\[(target_character)\.[^\]]+\]",
-        r"[\1]",
-        text,
-    )
-
-    return text
+        macro = static_macros.get(inner)
+        if macro is not None:
+            res = f"「{macro}」"
+        else:
+            # 2) 如果里面有 'key'，就把 key 当作本地化键
+            # 3) 否则原样保留
+            res = f"[{inner}]"
+            m_key = key_re.search(inner)
+            if m_key:
+                val = loc_get(m_key.group(1))
+                if val:
+                    res = f"「{val}」"
+
+        if "[target_character." in res:
+            res = TARGET_CHARACTER_RE.sub(r"[\1]", res)
+        return res
+
+    # 标记清理和所有 [ ... ] 替换在同一遍里完成
+    return RENDER_RE.sub(repl, text)
 
 CODE_TOKEN_MAP = {
     # ===== 基本逻辑 / 布尔 =====
@@ -782,78 +972,176 @@ CODE_TOKEN_MAP = {
 }
 
 
-def humanize_code_line(line, loc):
+def _trie_pattern(words):
     """
-    尝试把一行脚本翻译成自然语言。
-    返回：
-      - ""  -> 这行不输出（比如完全不想显示的内部逻辑，且不会破坏括号结构）
-      - 其他字符串 -> 翻译后文本
-      - None -> 保持原样，由外层按原行输出（再走 render_text）
+    把一组关键字编成前缀树形式的正则（类似 Aho–Corasick 的状态转移），
+    每个位置只沿着一条前缀往下试，而不是挨个尝试几百个分支。
     """
-    s = line.strip()
-    if not s:
-        return ""
+    trie = {}
+    for w in words:
+        node = trie
+        for ch in w:
+            node = node.setdefault(ch, {})
+        node[""] = {}
+
+    def build(node):
+        is_end = "" in node
+        alts = [re.escape(ch) + build(sub) for ch, sub in sorted(node.items()) if ch]
+        if not alts:
+            return ""
+        if len(alts) == 1 and not is_end:
+            return alts[0]
+        pat = "(?:" + "|".join(alts) + ")"
+        return pat + "?" if is_end else pat
+
+    return build(trie)
+
+
+# 一次扫描同时匹配 subject_level_sign 组合 token 和 CODE_TOKEN_MAP 中的关键字，
+# 两侧的 \b 保证只命中完整的标识符
+CODE_TOKEN_RE = re.compile(
+    r"\b(?:"
+    r"(?P<subject>[a-zA-Z_]+)_(?P<level>weak|mild|severe|extreme|ultimate)_(?P<sign>bonus|penalty|plus)"
+    r"|(?P<token>%s)"
+    r")\b" % _trie_pattern(CODE_TOKEN_MAP)
+)
 
 
-    # ========= tag&时间 相关 =========
-    
+# humanize_code_line 的各类处理：按行首的 key（第一个 = 之前的部分）查表分派，
+# 不用每行都跑一遍正则或一串 startswith
+CHANCE_RE = re.compile(r"monthly_chance\s*=\s*([-\d]+)")
+FIELD_VALUE_RE = re.compile(r"\w+\s*=\s*([^\s#]+)")
+
+
+def _humanize_chance(s, loc):
     # monthly_chance = 10  ->  月触发概率10%。
-    m = re.match(r"monthly_chance\s*=\s*([-\d]+)", s)
-    if m:
-        val = m.group(1)
-        return f"月触发概率{val}%"
+    m = CHANCE_RE.match(s)
+    return f"月触发概率{m.group(1)}%" if m else None
 
-    # ========= 要求（trigger）相关 =========
 
-    # ========= 立即触发（immediate）相关 =========
-    #key = philosophical_letters
-    m = re.match(r"key\s*=\s*([^\s#]+)", s)
-    if m:
+def _humanize_field(label):
+    """key = xxx 这类行：输出 `label = 「xxx 的本地化」`。"""
+    def handler(s, loc):
+        m = FIELD_VALUE_RE.match(s)
+        if not m:
+            return None
         key = m.group(1)
-        name = loc.get(key, key)
-        return f"作品 = 「{name}」"
+        return f"{label} = 「{loc.get(key, key)}」"
+    return handler
 
-    m = re.match(r"modifier\s*=\s*([^\s#]+)", s)
-    if m:
-        key = m.group(1)
-        name = loc.get(key, key)
-        return f"修正 = 「{name}」"
 
-    m = re.match(r"type\s*=\s*([^\s#]+)", s)
-    if m:
-        key = m.group(1)
-        name = loc.get(key, key)
-        return f"类型 = 「{name}」"
+def _hide_line(s, loc):
+    return ""
+
+
+LINE_HANDLERS = {
+    # ========= tag&时间 相关 =========
+    "monthly_chance": _humanize_chance,
+
+    # ========= 立即触发（immediate）相关 =========
+    "key": _humanize_field("作品"),        # key = philosophical_letters
+    "modifier": _humanize_field("修正"),
+    "type": _humanize_field("类型"),
+
+    # ========= 要求（trigger）相关 =========
 
     # 内部处理
-    if s.startswith("event_illustration_estate_effect"):
-        return ""
-    if s.startswith("event_illustration_government_estate_effect"):
-        return ""
-    if s.startswith("event_illustration_poptype_effect"):
-        return ""
+    "event_illustration_estate_effect": _hide_line,
+    "event_illustration_government_estate_effect": _hide_line,
+    "event_illustration_poptype_effect": _hide_line,
+    "save_scope_as": _hide_line,
+
+    # ========= 选项效果相关 =========
+}
+
 
-    if s.startswith("save_scope_as"):
+def humanize_code_line(line, loc):
+    """
+    尝试把一行脚本翻译成自然语言。
+    返回：
+      - ""  -> 这行不输出（比如完全不想显示的内部逻辑，且不会破坏括号结构）
+      - 其他字符串 -> 翻译后文本
+      - None -> 保持原样，由外层按原行输出（再走 render_text）
+    """
+    s = line.strip()
+    if not s:
         return ""
 
-    # ========= 选项效果相关 =========
+    handler = LINE_HANDLERS.get(s.partition("=")[0].rstrip())
+    if handler is None:
+        return None
+    return handler(s, loc)
 
-    return None
+# strip_braces 的单字符替换表：删掉 { } ?，= 换成 :
+STRIP_BRACES_TABLE = str.maketrans({"{": None, "}": None, "=": ":", "?": None})
 
 def strip_braces(text: str) -> str:
     """
     删除行中的所有 { 和 }，并去掉行尾空白。
     """
-    return text.replace("{", "").replace("}", "").replace("=",":").replace("?","").replace("非","不满足").rstrip()
+    return text.translate(STRIP_BRACES_TABLE).replace("非","不满足").rstrip()
 
 # ======= 输出单个事件 =======
 
-def write_event(out, event, loc):
+LEADING_TABS_RE = re.compile(r"\t*")
+
+# 一行脚本：group(1) 行首缩进，group(2) 去掉首尾空白后的内容；空白行不匹配
+CODE_LINE_RE = re.compile(r"^([^\S\n]*)(\S(?:.*\S)?)", re.M)
+
+def translate_lines(block_text, loc):
+    """
+    把一段脚本（多行文本）翻译成要输出的中文行。
+    返回列表 [(leading, content, text)]，空行跳过；text 为 None 表示这行不输出。
+
+    replace_colon_keys / translate_code_tokens 不逐行调用，
+    而是把整段需要处理的行用换行拼起来各替换一次，再拆回各行。
+    """
+    rows = []
+    colon_idx = []   # 没被 humanize 接管、含 ':' 需要做 prefix:key 替换的行
+
+    # 拆行、跳过空行、取缩进和内容都由 CODE_LINE_RE 一次扫描完成
+    for m in CODE_LINE_RE.finditer(block_text):
+        leading, content = m.groups()
+
+        human = humanize_code_line(content, loc)
+        if human is None:
+            # 大多数脚本行（add_xxx = 5 之类）没有 [ ] / # 标记也没有 prefix:key，
+            # render_text 直接原样返回，这里也用字符判断跳过 prefix:key 替换
+            text = render_text(content, loc)
+            if ":" in text:
+                colon_idx.append(len(rows))
+        elif human != "":
+            text = human
+        else:
+            text = None
+        rows.append([leading, content, text])
+
+    if colon_idx:
+        joined = replace_colon_keys("\n".join(rows[i][2] for i in colon_idx), loc)
+        for i, text in zip(colon_idx, joined.split("\n")):
+            rows[i][2] = text
+
+    shown_idx = [i for i, row in enumerate(rows) if row[2] is not None]
+    if shown_idx:
+        joined = translate_code_tokens("\n".join(rows[i][2] for i in shown_idx))
+        for i, text in zip(shown_idx, joined.split("\n")):
+            content = rows[i][1]
+            text = beautify_logic_line(content, text)   # ★ 逻辑美化
+            rows[i][2] = strip_braces(text)
+
+    return [tuple(row) for row in rows]
+
+
+def render_event(event, loc):
     """
-    将单个事件写入输出文件 out。
+    生成单个事件的全部输出文本并返回。
+
+    只读 event 自己的 block 和 loc，不写文件，可以放到子进程里并行跑。
     """
+    parts = []
     event_id = event["id"]
     block = event["block"]
+    brace_map = build_brace_map(block)
 
     # 标题 / 描述 / 历史信息
     title_key = get_assignment_key(block, "title")
@@ -867,170 +1155,127 @@ def write_event(out, event, loc):
     title_text = render_text(title_text_raw, loc)
 
     # 事件标题
-    out.write(f"{event_id}-{title_text}\n")
+    parts.append(f"{event_id}-{title_text}\n")
 
     # 描述
     if desc_text:
-        out.write("描述:\n")
-        out.write(indent_lines(render_text(desc_text, loc)) + "\n")
-        out.write("\n")
+        parts.append("描述:\n")
+        parts.extend((indent_lines(render_text(desc_text, loc)), "\n"))
+        parts.append("\n")
     # 历史信息
     if hist_text:
-        out.write("历史信息：\n")
-        out.write(indent_lines(render_text(hist_text, loc)) + "\n")
-        out.write("\n")
+        parts.append("历史信息：\n")
+        parts.extend((indent_lines(render_text(hist_text, loc)), "\n"))
+        parts.append("\n")
     # dynamic_historical_event 块
-    dhe_block = extract_block(block, "dynamic_historical_event")
+    dhe_block = extract_block(block, "dynamic_historical_event", brace_map)
     if dhe_block:
-        out.write("tag&时间：\n")
-        for line in dhe_block.splitlines():
-            raw = line.rstrip("\r\n")
-            if not raw.strip():
-                continue
-
-            leading = raw[:len(raw) - len(raw.lstrip())]
-            content = raw.strip()
-
-            human = humanize_code_line(content, loc)
-            if human is None:
-                text = render_text(content, loc)
-                text = replace_colon_keys(text, loc)
-                text = translate_code_tokens(text)
-                text = beautify_logic_line(content, text)   # ★ 逻辑美化
-                text = strip_braces(text)
-                out.write("\t" + leading + text + "\n")
-            elif human != "":
-                text = translate_code_tokens(human)
-                text = beautify_logic_line(content, text)   # ★ 逻辑美化
-                text = strip_braces(text)
-                out.write("\t" + leading + text + "\n")
-        out.write("\n")
+        parts.append("tag&时间：\n")
+        for leading, content, text in translate_lines(dhe_block, loc):
+            if text is not None:
+                parts.extend(("\t", leading, text, "\n"))
+        parts.append("\n")
     # trigger 块（要求）
-    trigger_block = extract_block(block, "trigger")
+    trigger_block = extract_block(block, "trigger", brace_map)
     if trigger_block:
-        out.write("要求：\n")
-        for line in trigger_block.splitlines():
-            raw = line.rstrip("\r\n")
-            if not raw.strip():
-                continue
+        parts.append("要求：\n")
+        for leading, content, text in translate_lines(trigger_block, loc):
+            if text is not None:
+                parts.extend(("\t", leading, text, "\n"))
 
-            leading = raw[:len(raw) - len(raw.lstrip())]
-            content = raw.strip()
-
-            human = humanize_code_line(content, loc)
-            if human is None:
-                text = render_text(content, loc)
-                text = replace_colon_keys(text, loc)
-                text = translate_code_tokens(text)
-                text = beautify_logic_line(content, text)   # ★
-                text = strip_braces(text)
-                out.write("\t" + leading + text + "\n")
-            elif human != "":
-                text = translate_code_tokens(human)
-                text = beautify_logic_line(content, text)   # ★
-                text = strip_braces(text)
-                out.write("\t" + leading + text + "\n")
-
-        out.write("\n")
-
-    immediate_block = extract_block(block, "immediate")
-    if immediate_block:
-        out.write("立即触发：\n")
+        parts.append("\n")
 
-        tmp_lines = []  # 每个元素：{"leading", "content", "text"}
-
-        for line in immediate_block.splitlines():
-            raw = line.rstrip("\r\n")
-            if not raw.strip():
-                continue
+    immediate_block = extract_block(block, "immediate", brace_map)
+    if immediate_block:
+        parts.append("立即触发：\n")
 
-            leading = raw[:len(raw) - len(raw.lstrip())]
-            content = raw.strip()
-
-            human = humanize_code_line(content, loc)
-
-            if human is None:
-                text = render_text(content, loc)
-                text = replace_colon_keys(text, loc)
-                text = translate_code_tokens(text)
-                text = beautify_logic_line(content, text)
-                text = strip_braces(text)
-            elif human != "":
-                text = translate_code_tokens(human)
-                text = beautify_logic_line(content, text)
-                text = strip_braces(text)
-            else:
-                text = ""
-
-            # ★ 在这里做逻辑美化（仅 OR/AND/NOT 等）
-            if text:
-                text = beautify_logic_line(content, text)
-
-            tmp_lines.append({
-                "leading": leading,
-                "content": content,
-                "text": text,
-            })
+        tmp_lines = [  # 每个元素：{"leading", "content", "text"}
+            {"leading": leading, "content": content, "text": text or ""}
+            for leading, content, text in translate_lines(immediate_block, loc)
+        ]
 
         cleanup_empty_scopes(tmp_lines)
 
         for info in tmp_lines:
             if info["text"] and info["text"].strip():
-                out.write("\t" + info["leading"] + info["text"] + "\n")
+                parts.extend(("\t", info["leading"], info["text"], "\n"))
 
-        out.write("\n")
+        parts.append("\n")
 
     # 选项
-    options = extract_option_blocks(block)
+    options = extract_option_blocks(block, brace_map)
     for opt in options:
         name_key = opt["name"]
         opt_title_raw = loc.get(name_key, name_key or "")
         opt_title = render_text(opt_title_raw, loc)
 
         if name_key:
-            out.write(f"{name_key}-{opt_title}\n")
+            parts.append(f"{name_key}-{opt_title}\n")
         else:
-            out.write("选项：\n")
+            parts.append("选项：\n")
 
-        # 先探测这个选项内部代码的“基础缩进”
+        # 先探测这个选项内部代码的“基础缩进”（opt["lines"] 里没有空行，看第一行即可）
         option_leading = ""
-        for raw_line in opt["lines"]:
-            if raw_line.strip():
-                m_tabs = re.match(r"^(\t*)", raw_line)
-                option_leading = m_tabs.group(1) if m_tabs else ""
-                break
+        if opt["lines"]:
+            option_leading = LEADING_TABS_RE.match(opt["lines"][0]).group(0)
 
         # custom_tooltip 对应的中文 —— 用和其他效果一样的缩进
         for tip_key in opt["tooltips"]:
             tip_text = loc.get(tip_key, tip_key)
-            out.write("\t" + option_leading + render_text(tip_text, loc) + "\n")
+            parts.extend(("\t", option_leading, render_text(tip_text, loc), "\n"))
 
         # 选项内部效果行
-        for raw_line in opt["lines"]:
-            raw = raw_line.rstrip("\r\n")
-            if not raw.strip():
-                continue
+        for leading, content, text in translate_lines("\n".join(opt["lines"]), loc):
+            if text is not None:
+                parts.extend(("\t", leading, text, "\n"))
+
+        parts.append("\n")
+
+    parts.append("\n\n")  # 事件之间空两行
+
+    return "".join(parts)
+
 
-            leading = raw[:len(raw) - len(raw.lstrip())]
-            content = raw.strip()
+# ======= 多进程输出 =======
 
-            human = humanize_code_line(content, loc)
-            if human is None:
-                text = render_text(content, loc)
-                text = replace_colon_keys(text, loc)
-                text = translate_code_tokens(text)
-                text = beautify_logic_line(content, text)   # ★
-                text = strip_braces(text)
-                out.write("\t" + leading + text + "\n")
-            elif human != "":
-                text = translate_code_tokens(human)
-                text = beautify_logic_line(content, text)   # ★
-                text = strip_braces(text)
-                out.write("\t" + leading + text + "\n")
+# 子进程里的本地化表，由 _init_render_worker 在进程启动时设置一次，避免每个任务都传一遍
+_worker_loc = None
 
-        out.write("\n")
 
-    out.write("\n\n")  # 事件之间空两行
+def _init_render_worker(loc):
+    global _worker_loc
+    _worker_loc = loc
+
+
+def encode_event(event, loc):
+    """
+    生成单个事件的输出内容，直接给出要写入文件的 bytes
+    （换行和文本模式一样按系统转换）。
+    """
+    text = render_event(event, loc)
+    if os.linesep != "\n":
+        text = text.replace("\n", os.linesep)
+    return text.encode("utf-8")
+
+
+def _render_event_in_worker(event):
+    return encode_event(event, _worker_loc)
+
+
+def render_events(events, loc):
+    """
+    按原顺序生成所有事件的输出内容（bytes）。
+    事件之间互不依赖，事件数达到 PARALLEL_MIN_EVENTS 时分发到多个进程，
+    编码也在子进程里完成，主进程只管写文件。
+    """
+    if len(events) < PARALLEL_MIN_EVENTS:
+        return [encode_event(ev, loc) for ev in events]
+
+    # 每个核分到约 4 批：批次太小时进程间往返太多，太大又容易让某个核最后空等
+    workers = os.cpu_count() or 1
+    chunksize = max(1, len(events) // (4 * workers))
+    with ProcessPoolExecutor(initializer=_init_render_worker, initargs=(loc,)) as ex:
+        return list(ex.map(_render_event_in_worker, events, chunksize=chunksize))
 
 
 # ======= 主程序 =======
@@ -1062,26 +1307,26 @@ def main():
 
     print(f"[信息] 使用事件代码文件: {code_path}")
 
-    with open(code_path, "r", encoding="utf-8-sig") as f:
-        code_text = f.read()
-
-    events = parse_events(code_text)
+    # 按 bytes mmap 进来，括号匹配和事件定位都在 bytes 上做，事件块再单独解码
+    with open(code_path, "rb") as f, map_file(f) as code:
+        events = parse_events(code)
     if not events:
         print(f"[错误] 没有找到任何事件（形如 {EVENT_PREFIX}.X = {{ ... }}）。")
         return
 
     print(f"[信息] 共找到 {len(events)} 个事件。")
 
-    # 加载本地化
-    loc = load_all_localizations(GAME_ROOT)
+    # 加载本地化，只留下这些事件会用到的部分
+    loc = filter_localization(load_all_localizations(GAME_ROOT), events)
+    print(f"[信息] 事件用到的本地化共 {len(loc)} 条键值。")
 
     # 输出文件，放在当前运行目录
     out_name = f"read_events_{TAG_LOWER}.txt"
     out_path = os.path.join(os.getcwd(), out_name)
 
-    with open(out_path, "w", encoding="utf-8") as out:
-        for ev in events:
-            write_event(out, ev, loc)
+    # 每个事件已经是编码好的 bytes，经 1MB 缓冲二进制写入，不再拼出整份输出
+    with open(out_path, "wb", buffering=1 << 20) as out:
+        out.writelines(render_events(events, loc))
 
     print(f"[完成] 已生成: {out_path}")
 
@@ -53,14 +53,27 @@ def get_country_name_from_tag(tag: str, loc: dict) -> str:
     # 找不到就沿用 TAG 本身
     return tag
 
+# loc 不可哈希，没法直接上 lru_cache；这里记住最近一份 loc 及其 TAG -> 国家名 结果，
+# 同一个国家在很多事件里反复出现，每个 TAG 只需查一次
+_country_name_cache = [None, {}]
+
+def _country_names_for(loc: dict) -> dict:
+    if _country_name_cache[0] is not loc:
+        _country_name_cache[0] = loc
+        _country_name_cache[1] = {}
+    return _country_name_cache[1]
+
 def replace_country_tags(text: str, loc: dict) -> str:
     """
     将整段文本里的 c:TAG 替换成对应国家名。
     """
+    names = _country_names_for(loc)
 
     def repl(m: re.Match) -> str:
         tag = m.group(1)
-        name = get_country_name_from_tag(tag, loc)
+        name = names.get(tag)
+        if name is None:
+            name = names[tag] = get_country_name_from_tag(tag, loc)
         return name
 
     return COUNTRY_TAG_RE.sub(repl, text)
@@ -146,13 +159,8 @@ def load_all_localizations(game_root):
         if os.path.isdir(location_names_dir):
             paths.extend(glob.glob(os.path.join(location_names_dir, "*_l_simp_chinese.yml")))
 
-    # 去重
-    uniq_paths = []
-    seen = set()
-    for p in paths:
-        if p not in seen:
-            uniq_paths.append(p)
-            seen.add(p)
+    # 去重（保持首次出现的顺序，后加载的同名 key 覆盖前面的）
+    uniq_paths = list(dict.fromkeys(paths))
 
     if not uniq_paths:
         print("[警告] 没有找到任何本地化 yml 文件。")